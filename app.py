@@ -1,17 +1,25 @@
 from __future__ import annotations   # <- wichtig für Typannotationen
 
+import copy
 import io
 import json
 import os
 from datetime import datetime
-from dataclasses import dataclass, field
-from typing import Dict, List
+from xml.sax.saxutils import escape
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
+import numpy as np
+import pandas as pd
 import streamlit as st
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from fpdf import FPDF
+# python-docx/lxml und fpdf2 werden erst in den Export-Funktionen importiert (Kaltstart ohne Export)
+if TYPE_CHECKING:
+    from fpdf import FPDF
+
+try:
+    import orjson
+except ImportError:  # Fallback, falls orjson im Deployment fehlt
+    orjson = None
 
 st.set_page_config(page_title="Hospitationsbogen (BLI 3.0)", layout="wide")
 
@@ -59,13 +67,22 @@ BLI_DATA = {
     }
 }
 
-AUTO_COMMENTS = {
-    0: "Bei der Hospitation war dieses Kriterium nicht erkennbar. Mögliche Ursache: Situations-/Phasenabhängigkeit.",
-    1: "Ansatzpunkte sind erkennbar. Eine Fokussierung auf klare Routinen/Transparenz könnte die Wirksamkeit erhöhen.",
-    2: "Grundlegend vorhanden. Durch Verbindlichkeit/Beispiele/Visualisierung weiter stärken.",
-    3: "Überwiegend gut umgesetzt. Punktuell lässt sich die Wirkung noch durch Schüleraktivierung vertiefen.",
-    4: "Sehr überzeugend umgesetzt; dient als Good-Practice-Beispiel."
-}
+# Flache Nachschlagetabellen statt verschachtelter BLI_DATA[mk]["criteria"][ck]-Zugriffe in den Schleifen
+_ALL_MODULES = tuple(BLI_DATA)
+MODULE_TITLE = {mk: m["title"] for mk, m in BLI_DATA.items()}
+MODULE_CRITERIA_ORDER = {mk: tuple(m["criteria"]) for mk, m in BLI_DATA.items()}
+CRITERION_TEXT = {(mk, ck): text for mk, m in BLI_DATA.items() for ck, text in m["criteria"].items()}
+# Überschriften/Beschriftungen ändern sich nie – einmal formatieren statt in jeder Export-Schleife
+_MODULE_HEADINGS = {mk: f'{mk} – {title}' for mk, title in MODULE_TITLE.items()}
+_CRITERION_LABELS = {(mk, ck): f'{ck} {text}' for (mk, ck), text in CRITERION_TEXT.items()}
+
+AUTO_COMMENTS = (  # Index = Bewertung 0–4
+    "Bei der Hospitation war dieses Kriterium nicht erkennbar. Mögliche Ursache: Situations-/Phasenabhängigkeit.",
+    "Ansatzpunkte sind erkennbar. Eine Fokussierung auf klare Routinen/Transparenz könnte die Wirksamkeit erhöhen.",
+    "Grundlegend vorhanden. Durch Verbindlichkeit/Beispiele/Visualisierung weiter stärken.",
+    "Überwiegend gut umgesetzt. Punktuell lässt sich die Wirkung noch durch Schüleraktivierung vertiefen.",
+    "Sehr überzeugend umgesetzt; dient als Good-Practice-Beispiel.",
+)
 
 # ----------------------------- Profile -----------------------------
 DEFAULT_PROFILES = {
@@ -77,17 +94,16 @@ if "profiles" not in st.session_state:
     st.session_state["profiles"] = DEFAULT_PROFILES.copy()
 
 # ----------------------------- Dataclasses -----------------------------
-@dataclass
+@dataclass(slots=True)
 class CriterionResult:
     rating: int = 0
     comment: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class ModuleResult:
-    module_key: str = ""
     criteria: Dict[str, CriterionResult] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class ObservationForm:
     date: str = ""
     colleague: str = ""
@@ -99,33 +115,70 @@ class ObservationForm:
     modules: Dict[str, ModuleResult] = field(default_factory=dict)
     strengths: str = ""
     next_steps: str = ""
-    profile_focus: List[str] = field(default_factory=list)
-    weights: Dict[str, float] = field(default_factory=dict)
+    # unveränderliche Momentaufnahmen aus der Sidebar; weights als sortierte (Merkmal, Gewicht)-Paare
+    profile_focus: Tuple[str, ...] = ()
+    weights: Tuple[Tuple[str, float], ...] = ()
 
 # ----------------------------- Helper -----------------------------
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _form_key(form: ObservationForm) -> bytes:
+    # Inhalts-Schlüssel für st.cache_data: gleiche Eingaben -> gleiche Export-Bytes
+    if orjson is not None:
+        return orjson.dumps(form)  # orjson serialisiert (Slots-)Dataclasses nativ, ohne asdict-Kopie
+    # nur Schlüssel, nie Download: kompakt, damit json den C-Encoder statt des reinen Python-Pfads nutzt
+    return json.dumps(asdict(form), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _new_module(mk: str) -> ModuleResult:
+    return ModuleResult(criteria={ck: CriterionResult(comment=AUTO_COMMENTS[0]) for ck in MODULE_CRITERIA_ORDER[mk]})
+
+def _sync_form_modules(form: ObservationForm, selected_modules: List[str]):
+    # nur das Delta: neue Merkmale anlegen, abgewählte entfernen, vorhandene Bewertungen behalten
+    current = form.modules
+    form.modules = {mk: current[mk] if mk in current else _new_module(mk) for mk in selected_modules}
+
 def init_form(selected_modules: List[str]) -> ObservationForm:
     form = ObservationForm(date=datetime.today().strftime("%Y-%m-%d"), modules={})
-    for mk in selected_modules:
-        mod = ModuleResult(module_key=mk, criteria={})
-        for ck in BLI_DATA[mk]["criteria"].keys():
-            mod.criteria[ck] = CriterionResult()
-        form.modules[mk] = mod
+    _sync_form_modules(form, selected_modules)
     return form
 
+def _sync_editor(mk: str):
+    # on_change-Callback: nur die im Editor geänderten Zellen ins Formular übernehmen
+    criteria = st.session_state["form"].modules[mk].criteria
+    order = list(criteria)
+    for row, changes in st.session_state[f"editor_{mk}"]["edited_rows"].items():
+        cres = criteria[order[int(row)]]
+        if "Bewertung" in changes:
+            cres.rating = int(changes["Bewertung"] or 0)
+        if "Kommentar" in changes:
+            cres.comment = changes["Kommentar"] or ""
+
 def compute_scores(form: ObservationForm):
-    per_module, weighted_sum, weight_total = {}, 0.0, 0.0
-    for mk, mod in form.modules.items():
-        ratings = [c.rating for c in mod.criteria.values()]
-        avg = sum(ratings) / len(ratings) if ratings else 0.0
-        per_module[mk] = avg
-        w = form.weights.get(mk, 1.0)
-        weighted_sum += avg * w
-        weight_total += w
-    overall = (weighted_sum / weight_total) if weight_total else 0.0
-    return per_module, overall
+    if not form.modules:
+        return {}, 0.0
+    # Merkmale x Kriterien als Matrix: Mittelwert je Zeile, danach gewichteter Gesamtwert
+    per_module = np.array([[c.rating for c in mod.criteria.values()] for mod in form.modules.values()],
+                          dtype=np.int8).mean(axis=1)
+    weight_of = dict(form.weights)
+    w = np.array([weight_of.get(mk, 1.0) for mk in form.modules], dtype=np.float64)
+    weight_total = w.sum()
+    overall = float((per_module * w).sum() / weight_total) if weight_total else 0.0
+    return dict(zip(form.modules, per_module.tolist())), overall
 
 # ----------------------------- Export DOCX -----------------------------
-def export_docx(form: ObservationForm) -> bytes:
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+@st.cache_resource(show_spinner=False)
+def _docx_template():
+    # Statischer Kopf (Styles, Titel) wird einmal pro Prozess gebaut; Exporte arbeiten auf einer Kopie
+    # des Pakets (deepcopy ~3 ms statt erneutem Parsen der gespeicherten Vorlage ~8 ms)
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+
     doc = Document()
     style = doc.styles['Normal']
     style.font.name = 'Calibri'
@@ -133,37 +186,65 @@ def export_docx(form: ObservationForm) -> bytes:
 
     h = doc.add_heading('Hospitationsbogen – BLI 3.0', level=1)
     h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    # das Paket kopieren, nicht das Document: lxml ignoriert beim deepcopy das memo, das Document hinge
+    # dann an anderen Elementen als sein Part
+    return doc.part.package
+
+def _run_xml(text: str, bold: bool = False) -> str:
+    # wie Run.text: Tabs -> <w:tab/>, Zeilenumbrüche -> <w:br/>
+    t = escape(text).replace('\r\n', '\n').replace('\r', '\n')
+    t = t.replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">').replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+    r_pr = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return f'<w:r>{r_pr}<w:t xml:space="preserve">{t}</w:t></w:r>'
+
+def _meta_paragraph_xml(pairs) -> str:
+    # ein <w:p> mit abwechselnd fettem Label und Wert statt einzelner add_run-Aufrufe
+    return '<w:p>' + ''.join(_run_xml(label, bold=True) + _run_xml(value) for label, value in pairs) + '</w:p>'
+
+def _build_table_xml(header, body_rows, col_width: int):
+    # ganze Tabelle als ein XML-String und ein parse_xml statt add_table/add_row über die python-docx-API
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+
+    tc_pr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{col_width}"/></w:tcPr>'
+    rows = ''.join('<w:tr>' + ''.join(f'<w:tc>{tc_pr}<w:p>{_run_xml(text)}</w:p></w:tc>' for text in row) + '</w:tr>'
+                   for row in (header, *body_rows))
+    grid = f'<w:gridCol w:w="{col_width}"/>' * len(header)
+    return parse_xml(
+        f'<w:tbl {nsdecls("w")}>'
+        '<w:tblPr><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        f'</w:tblPr><w:tblGrid>{grid}</w:tblGrid>{rows}</w:tbl>'
+    )
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False, hash_funcs={ObservationForm: _form_key})
+def export_docx(form: ObservationForm) -> bytes:
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    from docx.shared import Emu
 
-    meta = doc.add_paragraph()
-    meta.add_run('Datum: ').bold = True
-    meta.add_run(form.date + '    ')
-    meta.add_run('Kolleg*in: ').bold = True
-    meta.add_run(form.colleague + '    ')
-    meta.add_run('Beobachter*in: ').bold = True
-    meta.add_run(form.observer)
-
-    meta = doc.add_paragraph()
-    meta.add_run('Fach/Klasse/Thema: ').bold = True
-    meta.add_run(f'{form.subject} / {form.grade} / {form.topic}')
-    if form.school:
-        meta = doc.add_paragraph()
-        meta.add_run('Schule: ').bold = True
-        meta.add_run(form.school)
+    doc = copy.deepcopy(_docx_template()).main_document_part.document
 
+    # Kopfangaben: alle Absätze in einem Fragment parsen und vor sectPr einhängen
+    meta = [_meta_paragraph_xml([('Datum: ', form.date + '    '), ('Kolleg*in: ', form.colleague + '    '),
+                                 ('Beobachter*in: ', form.observer)]),
+            _meta_paragraph_xml([('Fach/Klasse/Thema: ', f'{form.subject} / {form.grade} / {form.topic}')])]
+    if form.school:
+        meta.append(_meta_paragraph_xml([('Schule: ', form.school)]))
     if form.profile_focus:
-        pf = doc.add_paragraph()
-        pf.add_run('Profil-Fokus: ').bold = True
-        pf.add_run(', '.join(form.profile_focus))
+        meta.append(_meta_paragraph_xml([('Profil-Fokus: ', ', '.join(form.profile_focus))]))
+    sect_pr = doc.element.body.sectPr
+    for p in list(parse_xml(f'<w:body {nsdecls("w")}>{"".join(meta)}</w:body>')):
+        sect_pr.addprevious(p)
 
+    sec = doc.sections[-1]
+    col_width = Emu(sec.page_width - sec.left_margin - sec.right_margin).twips // 3
     for mk, mod in form.modules.items():
-        doc.add_heading(f'{mk} – {BLI_DATA[mk]["title"]}', level=2)
-        table = doc.add_table(rows=1, cols=3)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text, hdr_cells[1].text, hdr_cells[2].text = 'Kriterium', 'Bewertung (0–4)', 'Kommentar/Hinweis'
-        for ck, cres in mod.criteria.items():
-            row = table.add_row().cells
-            row[0].text, row[1].text, row[2].text = f'{ck} {BLI_DATA[mk]["criteria"][ck]}', str(cres.rating), cres.comment or ''
-        doc.add_paragraph('')
+        doc.add_heading(_MODULE_HEADINGS[mk], level=2)
+        tbl = _build_table_xml(('Kriterium', 'Bewertung (0–4)', 'Kommentar/Hinweis'),
+                               [(_CRITERION_LABELS[mk, ck], str(cres.rating), cres.comment or '')
+                                for ck, cres in mod.criteria.items()], col_width)
+        doc.add_paragraph('')._p.addprevious(tbl)  # Tabelle vor den Leerabsatz setzen
 
     doc.add_heading('Stärken', level=2)
     doc.add_paragraph(form.strengths or '-')
@@ -181,73 +262,96 @@ def export_docx(form: ObservationForm) -> bytes:
     return bio.getvalue()
 
 # ----------------------------- Export JSON -----------------------------
+JSON_MIME = "application/json"
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False, hash_funcs={ObservationForm: _form_key})
 def export_json(form: ObservationForm) -> bytes:
+    modules = {}
+    for mk, mod in form.modules.items():
+        criteria = {}
+        for ck in MODULE_CRITERIA_ORDER[mk]:
+            c = mod.criteria[ck]
+            criteria[ck] = {"text": CRITERION_TEXT[mk, ck], "rating": c.rating, "comment": c.comment}
+        modules[mk] = {"title": MODULE_TITLE[mk], "criteria": criteria}
     data = {
         "date": form.date, "colleague": form.colleague, "subject": form.subject,
         "grade": form.grade, "topic": form.topic, "observer": form.observer, "school": form.school,
-        "profile_focus": form.profile_focus, "weights": form.weights,
-        "modules": {
-            mk: {
-                "title": BLI_DATA[mk]["title"],
-                "criteria": {ck: {"text": BLI_DATA[mk]["criteria"][ck], "rating": c.rating, "comment": c.comment}
-                             for ck, c in mod.criteria.items()}
-            } for mk, mod in form.modules.items()
-        },
+        "profile_focus": form.profile_focus, "weights": dict(form.weights),
+        "modules": modules,
         "strengths": form.strengths, "next_steps": form.next_steps
     }
-    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return _dumps(data)
 
 # ----------------------------- Export PDF -----------------------------
-def export_pdf(form: ObservationForm) -> bytes:
+PDF_MIME = "application/pdf"
+
+_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+_FONT_REGULAR = os.path.join(_FONT_DIR, "DejaVuSans.ttf")
+_FONT_BOLD = os.path.join(_FONT_DIR, "DejaVuSans-Bold.ttf")
+
+@st.cache_resource(show_spinner=False)
+def _pdf_template() -> FPDF:
+    # add_font parst die komplette TTF (~50 ms) – einmal pro Prozess, Exporte arbeiten auf einer Kopie
+    from fpdf import FPDF
+
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
+    # Unicode-Schrift aus fonts/: Umlaute, Gedankenstriche usw. ohne Umschrift
+    pdf.add_font("DejaVu", "", _FONT_REGULAR)
+    pdf.add_font("DejaVu", "B", _FONT_BOLD)
+    return pdf
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False, hash_funcs={ObservationForm: _form_key})
+def export_pdf(form: ObservationForm) -> bytes:
+    from fpdf.enums import XPos, YPos
+
+    pdf = copy.deepcopy(_pdf_template())
     pdf.add_page()
 
-    # Fonts (normale Helvetica reicht, aber Umlaute müssen notfalls ersetzt werden)
-    def safe(txt: str) -> str:
-        repl = {"ä": "ae", "ö": "oe", "ü": "ue", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ß": "ss", "–": "-"}
-        for k, v in repl.items():
-            txt = txt.replace(k, v)
-        return txt
+    family = "DejaVu"
+
+    pdf.set_font(family, "B", 16)
+    pdf.cell(0, 10, "Hospitationsbogen – BLI 3.0", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
 
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, safe("Hospitationsbogen – BLI 3.0"), ln=True, align="C")
+    pdf.set_font(family, "", 11)
+    def line(txt="", wrap=False):
+        # kurze, feste Zeilen als cell (kein Umbruch-Scan); freie Texte weiter über multi_cell
+        if wrap: pdf.multi_cell(0, 6, txt, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        else: pdf.cell(0, 6, txt, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
-    pdf.set_font("Helvetica", "", 11)
-    def line(txt=""): pdf.multi_cell(0, 6, safe(txt))
+    def heading(txt):
+        # einziger Schriftwechsel im Fließtext: Überschrift fett 13 pt, danach zurück auf 11 pt
+        pdf.set_font(family, "B", 13); line(txt); pdf.set_font(family, "", 11)
 
     line(f"Datum: {form.date}")
-    line(f"Kolleg*in: {form.colleague}")
-    line(f"Beobachter*in: {form.observer}")
-    line(f"Fach/Klasse/Thema: {form.subject} / {form.grade} / {form.topic}")
-    if form.school: line(f"Schule: {form.school}")
+    line(f"Kolleg*in: {form.colleague}", wrap=True)
+    line(f"Beobachter*in: {form.observer}", wrap=True)
+    line(f"Fach/Klasse/Thema: {form.subject} / {form.grade} / {form.topic}", wrap=True)
+    if form.school: line(f"Schule: {form.school}", wrap=True)
     if form.profile_focus: line("Profil-Fokus: " + ", ".join(form.profile_focus))
     pdf.ln(2)
 
     for mk, mod in form.modules.items():
-        pdf.set_font("Helvetica", "B", 13)
-        line(f"{mk} – {BLI_DATA[mk]['title']}")
-        pdf.set_font("Helvetica", "", 11)
+        heading(_MODULE_HEADINGS[mk])
         for ck, cres in mod.criteria.items():
-            line(f"{ck} {BLI_DATA[mk]['criteria'][ck]}")
+            line(_CRITERION_LABELS[mk, ck])
             line(f"  Bewertung: {cres.rating}/4")
-            if cres.comment: line(f"  Kommentar: {cres.comment}")
+            if cres.comment: line(f"  Kommentar: {cres.comment}", wrap=True)
             pdf.ln(1)
         pdf.ln(2)
 
-    pdf.set_font("Helvetica", "B", 13); line("Stärken")
-    pdf.set_font("Helvetica", "", 11); line(form.strengths or "-"); pdf.ln(2)
+    heading("Stärken")
+    line(form.strengths or "-", wrap=True); pdf.ln(2)
 
-    pdf.set_font("Helvetica", "B", 13); line("Nächste Schritte (konkret, terminiert)")
-    pdf.set_font("Helvetica", "", 11); line(form.next_steps or "-"); pdf.ln(2)
+    heading("Nächste Schritte (konkret, terminiert)")
+    line(form.next_steps or "-", wrap=True); pdf.ln(2)
 
     per_module, overall = compute_scores(form)
-    pdf.set_font("Helvetica", "B", 13); line("Zusammenfassung (Scores)")
-    pdf.set_font("Helvetica", "", 11)
+    heading("Zusammenfassung (Scores)")
     for mk, sc in per_module.items(): line(f"{mk}: {sc:.2f} / 4")
     line(f"Gesamt (gewichtet): {overall:.2f} / 4")
 
-    return pdf.output(dest="S").encode("latin-1", errors="ignore")
+    return bytes(pdf.output())
 
 # ----------------------------- UI -----------------------------
 st.title("Hospitationsbogen (BLI 3.0) – Generator")
@@ -259,12 +363,19 @@ with st.sidebar:
     new_name = st.text_input("Name für neues Profil", value="") if selected_profile == "— Neu —" else ""
     focus_default, weights_default = profiles[selected_profile]["focus"], profiles[selected_profile]["weights"]
 
-    st.subheader("Fokus-Merkmale")
-    focus = [mk for i, mk in enumerate(BLI_DATA.keys())
-             if st.checkbox(mk, value=(mk in focus_default), key=f"focus_{mk}")]
-    st.subheader("Gewichtungen (optional)")
-    weights = {mk: st.number_input(f"Gewicht {mk}", 0.0, 3.0, float(weights_default.get(mk, 1.0)), 0.1)
-               for mk in BLI_DATA.keys()}
+    # Fokus & Gewichte gesammelt übernehmen: Änderungen lösen erst mit "Anwenden" einen Rerun aus
+    with st.form("profile_form"):
+        # je ein Widget statt einer Checkbox/einem Zahlenfeld pro Merkmal
+        picked = st.multiselect("Fokus-Merkmale", _ALL_MODULES, default=focus_default, key="focus")
+        focus = [mk for mk in _ALL_MODULES if mk in picked]  # Reihenfolge wie in BLI_DATA
+        st.subheader("Gewichtungen (optional)")
+        w_df = pd.DataFrame([{mk: float(weights_default.get(mk, 1.0)) for mk in _ALL_MODULES}])
+        # Schlüssel je Profil: sonst legt Streamlit gespeicherte Änderungen über die Gewichte des neuen Profils
+        edited = st.data_editor(w_df, key=f"weights_{selected_profile}", num_rows="fixed", hide_index=True, column_config={
+            mk: st.column_config.NumberColumn(mk, min_value=0.0, max_value=3.0, step=0.1, required=True)
+            for mk in _ALL_MODULES})
+        weights = {mk: float(w) for mk, w in edited.iloc[0].items()}
+        st.form_submit_button("Anwenden")
 
     if st.button("Profil speichern"):
         key = new_name.strip() if (selected_profile == "— Neu —" and new_name.strip()) else selected_profile
@@ -281,22 +392,34 @@ with col3:
     subject, grade = st.text_input("Fach", value=""), st.text_input("Klasse/Jahrgang", value="")
 topic = st.text_input("Thema/Sequenz", value="")
 
-selected_modules = focus or list(BLI_DATA.keys())
-if "form" not in st.session_state or st.session_state.get("form_modules") != selected_modules:
-    st.session_state["form"] = init_form(selected_modules); st.session_state["form_modules"] = selected_modules
+selected_modules = focus or list(_ALL_MODULES)
+sel_key = tuple(selected_modules)
+if "form" not in st.session_state:
+    st.session_state["form"] = init_form(selected_modules); st.session_state["form_modules_key"] = sel_key
+elif st.session_state.get("form_modules_key") != sel_key:
+    _sync_form_modules(st.session_state["form"], selected_modules); st.session_state["form_modules_key"] = sel_key
 
 form: ObservationForm = st.session_state["form"]
 form.date, form.colleague, form.subject, form.grade, form.topic = date.strftime("%Y-%m-%d"), colleague, subject, grade, topic
-form.observer, form.school, form.profile_focus, form.weights = observer, school, selected_modules, weights
+form.observer, form.school = observer, school
+form.profile_focus, form.weights = tuple(selected_modules), tuple(sorted(weights.items()))
 
 st.subheader("Bewertung je Kriterium (0–4)")
+# Spaltenkonfiguration ist für alle Editoren gleich – einmal vorab statt je Merkmal
+editor_columns = {
+    "Bewertung": st.column_config.NumberColumn("Bewertung (0–4)", min_value=0, max_value=4, step=1),
+    "Kommentar": st.column_config.TextColumn("Kommentar", width="large"),
+}
 for mk in selected_modules:
-    with st.expander(f"{mk} – {BLI_DATA[mk]['title']}"):
-        for ck, ctext in BLI_DATA[mk]["criteria"].items():
-            rating = st.slider(f"{mk}.{ck}", 0, 4, value=form.modules[mk].criteria[ck].rating, key=f"rating_{mk}_{ck}")
-            default_comment = AUTO_COMMENTS.get(rating, "")
-            comment = st.text_area(f"Kommentar – {ctext}", value=form.modules[mk].criteria[ck].comment or default_comment, key=f"comment_{mk}_{ck}")
-            form.modules[mk].criteria[ck].rating, form.modules[mk].criteria[ck].comment = rating, comment
+    with st.expander(_MODULE_HEADINGS[mk]):
+        criteria = form.modules[mk].criteria
+        df = pd.DataFrame({
+            "Kriterium": [_CRITERION_LABELS[mk, ck] for ck in criteria],
+            "Bewertung": [c.rating for c in criteria.values()],
+            "Kommentar": [c.comment or AUTO_COMMENTS[c.rating] for c in criteria.values()],
+        })
+        st.data_editor(df, key=f"editor_{mk}", on_change=_sync_editor, args=(mk,),
+                       num_rows="fixed", hide_index=True, disabled=["Kriterium"], column_config=editor_columns)
 
 st.subheader("Zusammenfassung")
 form.strengths = st.text_area("Stärken", value=form.strengths or "")
@@ -309,16 +432,28 @@ if form.modules:
     cols[-1].metric("Gesamt (gewichtet)", f"{overall:.2f} / 4")
 
 st.subheader("Exportieren")
-c1, c2, c3 = st.columns(3)
-with c1:
-    st.download_button("DOCX herunterladen", export_docx(form),
-                       file_name=f"Hospitationsbogen_{form.colleague}_{form.date}.docx",
-                       mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-with c2:
-    st.download_button("PDF herunterladen", export_pdf(form),
-                       file_name=f"Hospitationsbogen_{form.colleague}_{form.date}.pdf", mime="application/pdf")
-with c3:
-    st.download_button("JSON herunterladen", export_json(form),
-                       file_name=f"Hospitationsbogen_{form.colleague}_{form.date}.json", mime="application/json")
+# Exporte erst auf Knopfdruck erzeugen; bei geänderten Inhalten verfallen die vorbereiteten Dateien
+form_key = _form_key(form)
+if st.session_state.get("export_key") != form_key:
+    st.session_state["export_key"], st.session_state["exports"] = form_key, {}
+exports = st.session_state["exports"]
+
+exporters = (("docx", export_docx, DOCX_MIME), ("pdf", export_pdf, PDF_MIME), ("json", export_json, JSON_MIME))
+# alle fehlenden Formate in einem Lauf statt drei Klicks/Reruns; nacheinander, da der PDF-Aufbau
+# reines Python unter der GIL ist und Threads hier nichts überlappen
+if st.button("Alle Formate vorbereiten", key="prepare_all"):
+    for ext, exporter, _ in exporters:
+        if ext not in exports:
+            exports[ext] = exporter(form)
+
+base = f"Hospitationsbogen_{form.colleague}_{form.date}"
+for col, (ext, exporter, mime) in zip(st.columns(3), exporters):
+    with col:
+        if st.button(f"{ext.upper()} vorbereiten", key=f"prepare_{ext}"):
+            exports[ext] = exporter(form)
+        if ext in exports:
+            st.download_button(f"{ext.upper()} herunterladen", exports[ext],
+                               file_name=f"{base}.{ext}", mime=mime,
+                               on_click="ignore")  # Download allein braucht keinen Rerun
 
 st.info("Hinweis: Inhalte, Skalen und Gewichtungen sind anpassbar. Bei Bedarf Indikatoren/Belege ergänzen.")